@@ -1,12 +1,16 @@
-#!/usr/bin/env python
-from itertools import combinations, tee, product
+#!/usr/bin/env python3
+from itertools import combinations, product
+from functools import reduce
+from operator import and_, or_, add
 from collections import Counter, defaultdict as DefaultDict
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
-from copy import deepcopy
-from fnmatch import fnmatch
+from fnmatch import translate as fnmatch_translate
 from textwrap import dedent
 from timeit import default_timer as timer
-from re import sub as re_sub
+from re import sub as re_sub, compile as re_compile
+from io import StringIO
+from contextlib import redirect_stdout
+from multiprocessing import Pool
 
 BLACK = "#"
 UNKNOWN = [".", " ", "*"]
@@ -16,6 +20,40 @@ BLACK_ALL = "abcdefghi"
 ACROSS = "123456789"
 DOWN = "ABCDEFGHI"
 
+# Each cell stores its candidate digits as a 9-bit mask, bit d-1 represents digit d.
+ALL_MASK = (1 << 9) - 1
+DIGIT_TO_MASK = {d: 1 << n for n, d in enumerate(ALL)}
+MASK_TO_DIGIT = {m: d for d, m in DIGIT_TO_MASK.items()}
+ALL_BITS = [DIGIT_TO_MASK[d] for d in ALL]
+
+POPCOUNT = int.bit_count
+
+
+# All legal straight masks (runs of consecutive digits) for each compartment length.
+STRAIGHTS = {length: [((1 << length) - 1) << n for n in range(10 - length)] for length in range(1, 10)}
+
+# NEIGHBOUR[m] has the digits adjacent to any digit of m, so a digit d is
+# bridgeable from m iff DIGIT_TO_MASK[d] & NEIGHBOUR[m].
+NEIGHBOUR = [((m << 1) | (m >> 1)) & ALL_MASK for m in range(1 << 9)]
+
+
+def bits(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+def mask_of(digits):
+    mask = 0
+    for d in digits:
+        mask |= DIGIT_TO_MASK[d]
+    return mask
+
+
+def digits_of(mask):
+    return [MASK_TO_DIGIT[bit] for bit in bits(mask)]
+
 
 def _pass(s):
     print("\033[40;92mPASS\033[0m {}".format(s))
@@ -57,35 +95,64 @@ def _info(s):
 # Cell and ProxyCell classes
 
 
+_CELL_PARSE_CACHE = {}
+
+
 class Cell(object):
     def __init__(self, digits):
         self.black = False
         self.given = False
-        self.digits = []
-        self.removed = set()
-        self.sure_candidates_by_row = set()
-        self.sure_candidates_by_col = set()
-
-        for d in digits:
-            if d == BLACK:
-                self.black = True
-            elif d in BLACK_ALL:
-                self.black = True
-                self.digits.append(str(ord(d) - 96))
-            elif d in ALL:
-                self.digits.append(d)
-                self.given = True
-            elif d in UNKNOWN:
-                self.digits.extend(ALL)
-
-        if len(self.digits) == 1:
-            self.known = True
+        self.mask = 0
+        self.removed = 0
+        self.sure_candidates_by_row = 0
+        self.sure_candidates_by_col = 0
+        # Filled in by the Board once the compartments have been generated
+        self.compartment_by_row = None
+        self.compartment_by_col = None
+        self.n = None
+        self.x = None
+        self.y = None
+        self.board = None
+
+        # The same digit strings recur across fixtures and puzzles, so parse each
+        # distinct one only once.
+        try:
+            parsed = _CELL_PARSE_CACHE[digits]
+        except (KeyError, TypeError):
+            parsed = None
+        if parsed is not None:
+            self.black, self.mask, self.given = parsed
         else:
-            self.known = False
+            for d in digits:
+                if d == BLACK:
+                    self.black = True
+                elif d in BLACK_ALL:
+                    self.black = True
+                    self.mask |= 1 << (ord(d) - 97)
+                elif d in ALL:
+                    self.mask |= DIGIT_TO_MASK[d]
+                    self.given = True
+                elif d in UNKNOWN:
+                    self.mask = ALL_MASK
+            try:
+                _CELL_PARSE_CACHE[digits] = (self.black, self.mask, self.given)
+            except TypeError:
+                pass
+
+        self.known = self.mask != 0 and self.mask & (self.mask - 1) == 0
 
     def __str__(self):
+        # Plain, ANSI-free rendering in the input format - cheap enough for logging.
+        if self.black:
+            return BLACK_ALL[self.mask.bit_length() - 1] if self.is_known() else BLACK
+        elif self.is_known():
+            return MASK_TO_DIGIT[self.mask]
+        else:
+            return UNKNOWN[0]
+
+    def pretty(self):
         if self.is_known():
-            digit = self.digits[0]
+            digit = MASK_TO_DIGIT[self.mask]
         else:
             digit = " "
 
@@ -98,7 +165,7 @@ class Cell(object):
         else:
             return "\033[100;30m \033[0m"
 
-    def __repr__(self):
+    def pretty_full(self):
         if self.black:
             parts = ["\033[40;97m"]
         elif self.is_unknown():
@@ -110,15 +177,16 @@ class Cell(object):
         else:
             parts = ["\033[100;30m"]
 
-        for x in ALL:
-            if x in self.removed:
+        for n, x in enumerate(ALL):
+            bit = 1 << n
+            if self.removed & bit:
                 parts.append("\033[31m{}\033[30m".format(x))
-            elif x in self.digits:
+            elif self.mask & bit:
                 if self.is_known():
                     parts.append(x)
                 else:
-                    sc_row = x in self.sure_candidates_by_row
-                    sc_col = x in self.sure_candidates_by_col
+                    sc_row = self.sure_candidates_by_row & bit
+                    sc_col = self.sure_candidates_by_col & bit
                     if sc_row and sc_col:
                         parts.append("\033[42m{}\033[100m".format(x))
                     elif sc_row:
@@ -131,17 +199,21 @@ class Cell(object):
                 parts.append(" ")
         parts.append("\033[0m")
 
-        self.removed.clear()
+        self.removed = 0
         return "".join(parts)
 
     def match(self, other):
         if self.is_black():
             if other in BLACK_ALL:
-                return self.digits[0] == str(ord(other) - 96)
+                return self.mask == 1 << (ord(other) - 97)
             else:
                 return other == BLACK
         else:
-            return set(self.digits) == set([d for d in other])
+            # A non-digit expectation (black or unknown marker) never matches
+            # a white cell; report the mismatch rather than choking on it.
+            if any(d not in DIGIT_TO_MASK for d in other):
+                return False
+            return self.mask == mask_of(other)
 
     def is_black(self):
         return self.black
@@ -157,27 +229,35 @@ class Cell(object):
 
     def value(self):
         assert self.is_known()
-        return self.digits[0]
+        return self.mask
 
-    def can_not_be(self, n):
+    def can_not_be(self, mask):
         if self.is_unknown():
-            for d in n:
-                if d in self.digits:
-                    self.digits.remove(d)
-                    self.removed.add(d)
-                    if d in self.sure_candidates_by_row:
-                        self.sure_candidates_by_row.remove(d)
-                    if d in self.sure_candidates_by_col:
-                        self.sure_candidates_by_col.remove(d)
-            if len(self.digits) == 1:
-                self.known = True
-
-    def value_is(self, n):
-        assert n in self.digits
-        for d in self.digits:
-            if d != n:
-                self.removed.add(d)
-        self.digits = [n]
+            removing = self.mask & mask
+            if removing:
+                self.mask &= ~mask
+                self.removed |= removing
+                self.sure_candidates_by_row &= self.mask
+                self.sure_candidates_by_col &= self.mask
+                board = self.board
+                if self.mask != 0 and self.mask & (self.mask - 1) == 0:
+                    self.known = True
+                    if board is not None:
+                        board._pending_known.add(self.n)
+                        board._completeness_val += 1
+                if board is not None:
+                    board._completeness_val += POPCOUNT(removing)
+                    board._mark_dirty(self)
+
+    def value_is(self, bit):
+        assert self.mask & bit
+        self.removed |= self.mask & ~bit
+        board = self.board
+        if board is not None:
+            board._completeness_val += POPCOUNT(self.mask & ~bit) + (not self.known)
+            board._pending_known.add(self.n)
+            board._mark_dirty(self)
+        self.mask = bit
         self.known = True
 
     def get_sc_by_row(self):
@@ -188,12 +268,12 @@ class Cell(object):
 
 
 class ProxyCell(object):
-    def __init__(self, digits, cell):
-        self.digits = set(digits)
+    def __init__(self, mask, cell):
+        self.mask = mask
         self.cell = cell
 
-    def can_not_be(self, n):
-        self.cell.can_not_be(n)
+    def can_not_be(self, mask):
+        self.cell.can_not_be(mask)
 
 
 ######################################################################################################################
@@ -226,46 +306,63 @@ def compartment_range_check_by_cells(compartment):
     #         x x|- - - - - - -
 
     # For each cell we test is any other cell contains digits that are out of range.
-    lowest = set()
-    highest = set()
+    # The claimed indices are masks, offset by one so an empty cell's -1 still fits.
+    lowest = 0
+    highest = 0
     for c in compartment:
-        min_digit_index = ALL.index(min(c.digits))
-        while min_digit_index < 9 and min_digit_index in lowest:
+        min_digit_index = (c.mask & -c.mask).bit_length() - 1
+        while min_digit_index < 9 and lowest >> (min_digit_index + 1) & 1:
             min_digit_index += 1
         else:
-            lowest.add(min_digit_index)
+            lowest |= 1 << (min_digit_index + 1)
 
-        max_digit_index = ALL.index(max(c.digits))
-        while max_digit_index >= 0 and max_digit_index in highest:
+        max_digit_index = c.mask.bit_length() - 1
+        while max_digit_index >= 0 and highest >> (max_digit_index + 1) & 1:
             max_digit_index -= 1
         else:
-            highest.add(max_digit_index)
+            highest |= 1 << (max_digit_index + 1)
 
-    digits_out_of_range = ALL[: max(max(lowest) - reach, 0)] + ALL[min(highest) + reach + 1 :]
+    digits_out_of_range = (1 << max(lowest.bit_length() - 2 - reach, 0)) - 1
+    digits_out_of_range |= ALL_MASK & ~((1 << ((highest & -highest).bit_length() - 2 + reach + 1)) - 1)
 
     if digits_out_of_range:
         for c in compartment:
             c.can_not_be(digits_out_of_range)
 
 
-def sure_candidates_by_cells(compartment, line, sc_fn):
-    union = set()
-    for c in compartment:
-        union.update(sc_fn(c))
+def prune_incompatible_straights(compartment_combinations):
+    # Arc-consistency pruning: a straight can only appear in a legal combination if
+    # every other compartment still offers a straight disjoint from it. Pruning to a
+    # fixed point keeps the product enumeration below to viable straights only.
+    pruned = True
+    while pruned:
+        pruned = False
+        for n, c_combinations in enumerate(compartment_combinations):
+            surviving = []
+            for s in c_combinations:
+                for m, others in enumerate(compartment_combinations):
+                    if m != n and not any(not s & o for o in others):
+                        break
+                else:
+                    surviving.append(s)
+            if len(surviving) != len(c_combinations):
+                compartment_combinations[n] = surviving
+                pruned = True
+
+
+def sure_candidates_by_cells(compartment, outside, sc_fn):
+    union = reduce(or_, map(sc_fn, compartment), 0)
     if union:
         # We can remove the sure candidates from all other cells outside of the compartment
-        for c in line:
-            if c in compartment:
-                continue
-            else:
-                c.can_not_be(union)
+        for c in outside:
+            c.can_not_be(union)
 
 
 def singles_by_cell(compartment, sc_fn):
     # Search for singles in the sure candidates
     digit_in_cells = DefaultDict(set)
     for c in compartment:
-        for d in sc_fn(c):
+        for d in bits(sc_fn(c)):
             digit_in_cells[d].add(c)
 
     # If any sure candidate is only in one cell, then cell is the sure candidate
@@ -276,101 +373,105 @@ def singles_by_cell(compartment, sc_fn):
 
 
 def stranded_digits_by_cells(compartment):
-    def yield_groups(union_of_compartment):
-        g = []
-        for n in ALL:
-            if n in union_of_compartment:
-                g.append(n)
-            elif g:
-                yield g
-                g = []
-        else:
-            if g:
-                yield (g)
-
     # We now union the available digits in the group.
-    union = set()
-    for c in compartment:
-        union.update(c.digits)
+    union = reduce(or_, (c.mask for c in compartment), 0)
 
+    # Walk the union splitting it into runs of consecutive digits; the trailing
+    # zero bit flushes the final run.
     len_compartment = len(compartment)
-    for g in yield_groups(union):
-        if len(g) < len_compartment:
-            # The compartment doesn't fit into this group.
-            # Remove all digits of the group from the compartment digits.
-            for d in g:
+    g = 0
+    for n in ALL_BITS + [0]:
+        if n & union:
+            g |= n
+        elif g:
+            if POPCOUNT(g) < len_compartment:
+                # The compartment doesn't fit into this group.
+                # Remove all digits of the group from the compartment digits.
                 for c in compartment:
-                    c.can_not_be(d)
+                    c.can_not_be(g)
+            g = 0
 
 
 def bridging_digits_by_cells(compartment):
-    siblings = {"1": "2", "2": "13", "3": "24", "4": "35", "5": "46", "6": "57", "7": "68", "8": "79", "9": "8"}
     if len(compartment) > 1:
-        for cell in compartment:
-            remove = set()
-            for d in cell.digits:
-                searching_for = siblings[d]
-                # We check in another cell can touch this digit.
-                hit = False
-                for c in compartment:
-                    if c != cell:
-                        for s in searching_for:
-                            if s in c.digits:
-                                hit = True
-                                break
-                    if hit:
-                        break
-                else:
-                    remove.add(d)
-            for d in remove:
-                cell.can_not_be(d)
+        # The union of every other cell's digits, via prefix and suffix unions.
+        masks = [c.mask for c in compartment]
+        others = []
+        before = 0
+        for m in masks:
+            others.append(before)
+            before |= m
+        after = 0
+        for n in range(len(masks) - 1, -1, -1):
+            others[n] |= after
+            after |= masks[n]
+
+        for cell, mask, other in zip(compartment, masks, others):
+            # Digits no other cell can touch are removed in one mask op.
+            remove = mask & ~NEIGHBOUR[other]
+            if remove:
+                cell.can_not_be(remove)
 
 
 def stranded_by_bridge_by_cells(compartment):
-    counts = Counter()
+    # Carry-save the digit frequencies: seen2 collects digits seen at least
+    # twice, so seen1 & ~seen2 is the mask of digits unique to one cell.
+    seen1 = 0
+    seen2 = 0
     for c in compartment:
-        for d in c.digits:
-            counts[d] += 1
+        seen2 |= seen1 & c.mask
+        seen1 |= c.mask
+    union = seen1
+    singles_mask = seen1 & ~seen2
     # Search for a cell that has multiple singles
     for c in compartment:
-        singles = set(d for d in c.digits if counts[d] == 1)
-        if len(singles) > 1:
+        singles = c.mask & singles_mask
+
+        if POPCOUNT(singles) > 1:
             # If a single can only be in a solution *including* another solution, then it is removed.
             len_compartment = len(compartment)
-            min_digit, max_digit = min(counts), max(counts)
-            min_digit_index, max_digit_index = ALL.index(min_digit), ALL.index(max_digit)
-            solutions = [
-                ALL[i : i + len_compartment] for i in range(min_digit_index, max_digit_index + 2 - len_compartment)
-            ]
-
-            isolated_singles = set()
-            for s in solutions:
-                found_singles = set(single for single in singles if single in s)
-                if len(found_singles) == 1:
-                    isolated_singles.update(found_singles)
-            for s in singles:
-                if s not in isolated_singles:
-                    # This single is illegal.
-                    for c in compartment:
-                        c.can_not_be(s)
+            min_digit_index, max_digit_index = (union & -union).bit_length() - 1, union.bit_length() - 1
+
+            isolated_singles = 0
+            s = ((1 << len_compartment) - 1) << min_digit_index
+            for _ in range(min_digit_index, max_digit_index + 2 - len_compartment):
+                found_singles = singles & s
+                if POPCOUNT(found_singles) == 1:
+                    isolated_singles |= found_singles
+                s <<= 1
+            illegal = singles & ~isolated_singles
+            if illegal:
+                # These singles are illegal.
+                for c in compartment:
+                    c.can_not_be(illegal)
 
 
 def naked_groups_by_cells(cells):
-    # For each line we consider all combinations searching for naked groups
-    for r in range(len(cells), 1, -1):
-        for combination in combinations(cells, r):
-            digits = set()
-            for c in combination:
-                digits.update(c.digits)
-            if len(digits) == r:
-                # We need to check that there isn't another cell which can be added to this group,
-                # if so, it would have all it's digits removed.
-                for c in cells:
-                    if c in combination:
-                        continue
-                    elif not digits.issuperset(c.digits):
-                        # We have a naked group. Exclude this digits from the other cells.
-                        c.can_not_be(digits)
+    # A naked group is a subset of cells whose digit union has exactly as many
+    # digits as cells. Enumerate every cell subset with a union-by-lowest-bit DP
+    # instead of itertools.combinations at each group size.
+    len_cells = len(cells)
+    cell_masks = [c.mask for c in cells]
+    unions = [0] * (1 << len_cells)
+    for s in range(1, 1 << len_cells):
+        low = s & -s
+        unions[s] = unions[s ^ low] | cell_masks[low.bit_length() - 1]
+
+    all_cells = (1 << len_cells) - 1
+    # Consider the largest groups first, to match the combination search order.
+    for s in sorted(range(1, 1 << len_cells), key=POPCOUNT, reverse=True):
+        r = POPCOUNT(s)
+        if r < 2:
+            break
+        digits = unions[s]
+        if POPCOUNT(digits) == r:
+            # We need to check that there isn't another cell which can be added to this group,
+            # if so, it would have all it's digits removed.
+            for other in bits(all_cells & ~s):
+                c = cells[other.bit_length() - 1]
+                if c.mask & ~digits:
+                    # We have a naked group. Exclude this digits from the other cells.
+                    c.can_not_be(digits)
 
 
 def split_compartments_by_cells(compartment):
@@ -379,58 +480,56 @@ def split_compartments_by_cells(compartment):
         # ??? We want to add this to the test, but it takes a whole board not the split cells
         # unique_rectangle_rule,
     ]
-    union = set()
-    for c in compartment:
-        union.update(c.digits)
-    for g in ALL:
-        if g not in union:
-            below = set(d for d in union if d < g)
-            above = set(d for d in union if d > g)
+    union = reduce(or_, (c.mask for c in compartment), 0)
+    for g in ALL_BITS:
+        if not g & union:
+            below = union & (g - 1)
+            above = union & ~((g << 1) - 1)
             if below and above:
                 # print('Split compartment col:{}{} below:{} gap:{} above:{}'.format(x, compartment, below, g, above))
-                above_cells = [ProxyCell(below.intersection(c.digits), c) for c in compartment]
-                below_cells = [ProxyCell(above.intersection(c.digits), c) for c in compartment]
+                above_cells = [ProxyCell(below & c.mask, c) for c in compartment]
+                below_cells = [ProxyCell(above & c.mask, c) for c in compartment]
                 for s in steps:
                     s(above_cells)
                     s(below_cells)
 
 
 def mind_the_gap_by_cells(cells):
-    def _pairwise(iter):
-        a, b = tee(iter)
-        next(b, None)
-        return zip(a, b)
-
     # We search for cells with a large gap
     # Gap is 'large' if the distance is >= the compartment size
     len_compartment = len(cells)
     for cell in cells:
-        for d1, d2 in _pairwise(cell.digits):
-            index_d1, index_d2 = ALL.index(d1), ALL.index(d2)
-            if index_d2 - index_d1 >= len_compartment:
-                if not set(ALL[:index_d1]).intersection(cell.digits):
+        mask = cell.mask
+        d1 = mask & -mask
+        remaining = mask ^ d1
+        while remaining:
+            d2 = remaining & -remaining
+            remaining ^= d2
+            if d2.bit_length() - d1.bit_length() >= len_compartment:
+                if not (d1 - 1) & mask:
                     # These numbers can't be in the other cells
                     for c in cells:
                         if c != cell:
                             c.can_not_be(d1)
-                if not set(ALL[index_d2 + 1 :]).intersection(cell.digits):
+                if not (ALL_MASK & ~((d2 << 1) - 1)) & mask:
                     # These numbers can't be in the other cells
                     for c in cells:
                         if c != cell:
                             c.can_not_be(d2)
+            d1 = d2
 
 
 def mind_the_bridging_gap_by_cells(cells):
     len_compartment = len(cells)
-    small_cells = [c for c in cells if len(c.digits) == 2]
+    small_cells = [c for c in cells if POPCOUNT(c.mask) == 2]
     # We search for 2 cells with only 2 digits, a shared digit and a large gap
     for combination in combinations(small_cells, 2):
-        a_digits = set(combination[0].digits)
-        b_digits = set(combination[1].digits)
-        bridge = a_digits.intersection(b_digits)
-        if len(bridge) == 1:
-            a_index = ALL.index(a_digits.difference(bridge).pop())
-            b_index = ALL.index(b_digits.difference(bridge).pop())
+        a_digits = combination[0].mask
+        b_digits = combination[1].mask
+        bridge = a_digits & b_digits
+        if POPCOUNT(bridge) == 1:
+            a_index = (a_digits & ~bridge).bit_length() - 1
+            b_index = (b_digits & ~bridge).bit_length() - 1
             if (a_index > b_index and a_index - b_index >= len_compartment) or (b_index - a_index >= len_compartment):
                 # We can remove the bridge from all other cells
                 for c in cells:
@@ -439,86 +538,101 @@ def mind_the_bridging_gap_by_cells(cells):
 
 
 def hidden_group_by_cells(compartment, sc_fn):
-    union = set()
-    for c in compartment:
-        union.update(sc_fn(c))
+    union = reduce(or_, map(sc_fn, compartment), 0)
     if union:
-        for r in range(2, len(union)):
-            for combination in combinations(union, r):
-                # We count the cells that have contain these sure candidates
-                cells = set()
-                for c in compartment:
-                    for d in combination:
-                        if d in c.digits:
-                            cells.add(c)
-                            break
-                # If the # of cells containing the combination is equal
+        # Localise the cell masks; the subset loop re-reads them repeatedly.
+        masks = [c.mask for c in compartment]
+        max_r = POPCOUNT(union)
+        # Enumerate the digit subsets of the union with the (s - 1) & union trick.
+        s = union
+        while s:
+            r = POPCOUNT(s)
+            if 2 <= r < max_r:
+                # We count the cells that contain these sure candidates
+                cells = [c for c, m in zip(compartment, masks) if m & s]
+                # If the # of cells containing the subset is equal
                 if len(cells) == r:
-                    can_not_be = set(ALL)
-                    can_not_be.difference_update(combination)
+                    can_not_be = ALL_MASK & ~s
                     # Then we remove all the other candidates from the cells.
                     for c in cells:
                         c.can_not_be(can_not_be)
+            s = (s - 1) & union
 
 
 def hidden_group_by_cross_cells(compartment, sure_candidates):
-    for r in range(2, len(sure_candidates)):
-        for combination in combinations(sure_candidates, r):
-            # We count the cells that have contain these sure candidates
-            cells = set()
-            for c in compartment:
-                for d in combination:
-                    if d in c.digits:
-                        cells.add(c)
-                        break
-            # If the # of cells containing the combination is equal
+    # Localise the cell masks; the subset loop re-reads them repeatedly.
+    masks = [c.mask for c in compartment]
+    max_r = POPCOUNT(sure_candidates)
+    # Enumerate the digit subsets of the sure candidates with the (s - 1) & union trick.
+    s = sure_candidates
+    while s:
+        r = POPCOUNT(s)
+        if 2 <= r < max_r:
+            # We count the cells that contain these sure candidates
+            cells = [c for c, m in zip(compartment, masks) if m & s]
+            # If the # of cells containing the subset is equal
             if len(cells) == r:
-                can_not_be = set(ALL)
-                can_not_be.difference_update(combination)
+                can_not_be = ALL_MASK & ~s
                 # Then we remove all the other candidates from the cells.
                 for c in cells:
                     c.can_not_be(can_not_be)
+        s = (s - 1) & sure_candidates
 
 
-def sure_candidate_upgrade_by_cells(compartments, sure_candidates, sc_fn):
+def sure_candidate_upgrade_by_cells(compartments, sure_candidates, sc_attr):
     hit = False
-    for d in sure_candidates:
+    # Union each compartment once rather than re-scanning the cells per digit.
+    comp_unions = [reduce(or_, (cell.mask for cell in compartment), 0) for compartment in compartments]
+    for d in bits(sure_candidates):
         # If d is only in 1 compartment then it is a sure candidate.
         compartment_count = 0
-        for compartment in compartments:
-            for cell in compartment:
-                if d in cell.digits:
-                    compartment_count += 1
-                    break
+        for union in comp_unions:
+            if union & d:
+                compartment_count += 1
         if compartment_count == 1:
             for compartment in compartments:
                 for cell in compartment:
-                    if d in cell.digits and d not in sc_fn(cell):
-                        sc_fn(cell).add(d)
+                    sc = getattr(cell, sc_attr)
+                    if cell.mask & d and not sc & d:
+                        setattr(cell, sc_attr, sc | d)
                         hit = True
     return hit
 
 
 def sure_candidate_range_check_by_cells(compartment, sc_fn):
     # We need to make sure that all digits are within range of the sure candidates.
-    sc_for_compartment = [sc_fn(c) for c in compartment if sc_fn(c)]
-    if sc_for_compartment:
-        sc_min = min(min(sc) for sc in sc_for_compartment)
-        sc_max = max(max(sc) for sc in sc_for_compartment)
-        sc_min_index = ALL.index(sc_min)
-        sc_max_index = ALL.index(sc_max)
+    sc_union = reduce(or_, map(sc_fn, compartment), 0)
+    if sc_union:
+        sc_min_index = (sc_union & -sc_union).bit_length() - 1
+        sc_max_index = sc_union.bit_length() - 1
 
         len_compartment = len(compartment)
-        out_of_range = ALL[: max(sc_max_index - len_compartment + 1, 0)] + ALL[sc_min_index + len_compartment :]
+        out_of_range = (1 << max(sc_max_index - len_compartment + 1, 0)) - 1
+        out_of_range |= ALL_MASK & ~((1 << min(sc_min_index + len_compartment, 9)) - 1)
         if out_of_range:
-            if False:
-                print("compartment", compartment)
-                print("sc for compartment", sc_for_compartment)
-                print("out of range", out_of_range)
             for c in compartment:
                 c.can_not_be(out_of_range)
 
 
+def find_sea_creatures(cand_masks):
+    # Yield the line sets whose candidate positions union to exactly as many
+    # positions as lines in the set, smallest sets first.
+    # ??? Is it better to search from large to small?
+    n = len(cand_masks)
+    for r in range(2, n + 1):
+        for combination in combinations(range(n), r):
+            # The union only grows, so bail as soon as it exceeds r positions.
+            union = 0
+            for i in combination:
+                union |= cand_masks[i]
+                if POPCOUNT(union) > r:
+                    break
+            else:
+                if POPCOUNT(union) == r:
+                    yield combination, union
+
+
+
 ######################################################################################################################
 # Board class
 
@@ -539,29 +653,75 @@ class Board(dict):
                     self[ACROSS[x], DOWN[y]] = Cell(c)
 
         self.chain_length = chain_length
+        # Flat row-major cell list for whole-board scans, avoiding keyed lookups
+        self.cells = list(self.values())
+        # Cached per-line cell lists so rules stop rebuilding them per call
+        self._row_cells = {y: [self[x, y] for x in ACROSS] for y in DOWN}
+        self._col_cells = {x: [self[x, y] for y in DOWN] for x in ACROSS}
+        # Cached item lists; whiteness is static for the board's lifetime
+        self._items = list(self.items())
+        self._white_items = [(k, c) for k, c in self._items if c.is_white()]
+        # Tag each cell with its position and board so mask changes can be tracked
+        for n, ((x, y), c) in enumerate(self._items):
+            c.n = n
+            c.x = x
+            c.y = y
+            c.board = self
+        # Cells push themselves here as they become known
+        self._pending_known = set()
+        # Per-rule dirty line sets; mask-only rules drain these to skip lines
+        # nothing has touched since they last ran
+        self._dirty_by_row = {}
+        self._dirty_by_col = {}
+        # Maintained incrementally by the cells; recomputed once construction settles
+        self._completeness_val = 0
         # Generate and store compartments
         self.compartments_by_row = self._generate_compartments_by_row()
         self.compartments_by_col = self._generate_compartments_by_col()
+        # Tag each cell with its compartments, making membership tests O(1)
+        for compartments in self.compartments_by_row.values():
+            for compartment in compartments:
+                for c in compartment:
+                    c.compartment_by_row = compartment
+        for compartments in self.compartments_by_col.values():
+            for compartment in compartments:
+                for c in compartment:
+                    c.compartment_by_col = compartment
+        # Flat compartment lists so orientation-blind passes run one tight loop
+        self.all_compartments_by_row = [c for _, c in self._iter_compartments_by_row()]
+        self.all_compartments_by_col = [c for _, c in self._iter_compartments_by_col()]
+        # Precompute the line cells outside each compartment, keyed by identity
+        self._outside_by_row = {
+            id(compartment): [c for c in self._row_cells[y] if c.compartment_by_row is not compartment]
+            for y, compartment in self._iter_compartments_by_row()
+        }
+        self._outside_by_col = {
+            id(compartment): [c for c in self._col_cells[x] if c.compartment_by_col is not compartment]
+            for x, compartment in self._iter_compartments_by_col()
+        }
         # Generate and store the sure candidates
-        self.sure_candidates_by_cross_row = DefaultDict(set)
-        self.sure_candidates_by_cross_col = DefaultDict(set)
+        self.sure_candidates_by_cross_row = DefaultDict(int)
+        self.sure_candidates_by_cross_col = DefaultDict(int)
         self._sure_candidates_by_row()
         self._sure_candidates_by_col()
         # Known digits
         self._known_cells = {}
-        # Counters to tracking the solver
-        self.counts = Counter()
-        self.hits = Counter()
-        self.durations = DefaultDict(float)
+        self._pending_known = {n for n, c in enumerate(self.cells) if c.known}
+        cells = self.cells
+        self._completeness_val = 729 - sum(map(POPCOUNT, (c.mask for c in cells))) + sum(c.known for c in cells)
+        # Counters to tracking the solver, indexed by step order
+        self.counts = [0] * len(Board.steps)
+        self.hits = [0] * len(Board.steps)
+        self.durations = [0.0] * len(Board.steps)
 
     ######################################################################################################################
     # Methods to generate and iterate the compartments
 
     def _generate_compartments_by_row(self):
-        return {y: generate_compartments_by_cell([self[x, y] for x in ACROSS]) for y in DOWN}
+        return {y: generate_compartments_by_cell(self._row_cells[y]) for y in DOWN}
 
     def _generate_compartments_by_col(self):
-        return {x: generate_compartments_by_cell([self[x, y] for y in DOWN]) for x in ACROSS}
+        return {x: generate_compartments_by_cell(self._col_cells[x]) for x in ACROSS}
 
     def _iter_compartments_by_row(self):
         for y in DOWN:
@@ -596,155 +756,95 @@ class Board(dict):
     # Methods to generate the sure candidates
 
     def _sure_candidates_by_row(self, remove_unusable=False):
-        for y in DOWN:
-            if len(self.compartments_by_row[y]) > 1:
-                compartment_combinations = []
-                total_length = 0
-                for compartment in self.compartments_by_row[y]:
-                    # Generate a sorted list of all the digits used in the compartment.
-                    union = set()
-                    for c in compartment:
-                        union.update(c.digits)
-                    union_list = sorted(union)
-
-                    # Generate all possible combinations of str8ts for the compartment.
-                    len_compartment = len(compartment)
-                    c_combinations = []
-                    for n in range(1 + len(union_list) - len_compartment):
-                        index_start = ALL.index(union_list[n])
-                        index_end = ALL.index(union_list[n + len_compartment - 1])
-                        if index_end - index_start == len_compartment - 1:
-                            c_combinations.append(set(union_list[n : n + len_compartment]))
-
-                    # These are stored for each compartment.
-                    compartment_combinations.append(c_combinations)
-                    total_length += len_compartment
-
-                # If we have more than 1 compartment we make all the possible combinations that are legal.
-                row_unions = []
-                legal_compartments = [[] for c in compartment_combinations]
-                for combinations in product(*compartment_combinations):
-                    union = set.union(*combinations)
-                    # Is a legal combination
-                    if len(union) == total_length:
-                        # Make a union for the row
-                        row_unions.append(union)
-                        # Add the legal combinations to their compartment lists.
-                        for n, c in enumerate(combinations):
-                            legal_compartments[n].append(c)
-
-                row_union = set.intersection(*row_unions)
-                self.sure_candidates_by_cross_row[y].update(row_union)
-                for n, legal_unions in enumerate(legal_compartments):
-                    compartment_union = set.union(*legal_unions)
-                    compartment_intersection = set.intersection(*legal_unions)
-                    for c in self.compartments_by_row[y][n]:
-                        if remove_unusable:
-                            for d in c.digits:
-                                if d not in compartment_union:
-                                    c.can_not_be(d)
-                        c.sure_candidates_by_row.update(compartment_intersection)
-                        c.sure_candidates_by_row.intersection_update(c.digits)
-            else:
-                for compartment in self.compartments_by_row[y]:
-                    union = set()
-                    for c in compartment:
-                        union.update(c.digits)
-
-                    index_min = ALL.index(min(union))
-                    index_max = ALL.index(max(union)) + 1  # Required for correct range
-                    len_compartment = len(compartment)
-                    lowest_range = set(ALL[index_min : index_min + len_compartment])
-                    highest_range = set(ALL[index_max - len_compartment : index_max])
-                    intersection = lowest_range.intersection(highest_range)
-
-                    if intersection:
-                        # Add the sure candidates to each cell assuming they're present.
-                        self.sure_candidates_by_cross_row[y].update(intersection)
-                        for c in compartment:
-                            # Add the intersection to each cell.
-                            c.sure_candidates_by_row.update(intersection)
-                            # Remove any that aren't possible.
-                            c.sure_candidates_by_row.intersection_update(c.digits)
+        self._sure_candidates(self.compartments_by_row, self.sure_candidates_by_cross_row, "sure_candidates_by_row", remove_unusable)
 
     def _sure_candidates_by_col(self, remove_unusable=False):
-        for x in ACROSS:
-            if len(self.compartments_by_col[x]) > 1:
+        self._sure_candidates(self.compartments_by_col, self.sure_candidates_by_cross_col, "sure_candidates_by_col", remove_unusable)
+
+    def _sure_candidates(self, compartments_by_line, cross_bucket, sc_attr, remove_unusable=False):
+        for key, compartments in compartments_by_line.items():
+            if len(compartments) > 1:
                 compartment_combinations = []
-                total_length = 0
-                for compartment in self.compartments_by_col[x]:
-                    # Generate a sorted list of all the digits used in the compartment.
-                    union = set()
-                    for c in compartment:
-                        union.update(c.digits)
-                    union_list = sorted(union)
-
-                    # Generate all possible combinations of str8ts for the compartment.
+                for compartment in compartments:
+                    # Generate a union of all the digits used in the compartment.
+                    union = reduce(or_, (c.mask for c in compartment), 0)
+
+                    # All possible straights for the compartment are the precomputed
+                    # masks of its length that only use digits from the union.
                     len_compartment = len(compartment)
-                    c_combinations = []
-                    for n in range(1 + len(union_list) - len_compartment):
-                        index_start = ALL.index(union_list[n])
-                        index_end = ALL.index(union_list[n + len_compartment - 1])
-                        if index_end - index_start == len_compartment - 1:
-                            c_combinations.append(set(union_list[n : n + len_compartment]))
+                    c_combinations = [s for s in STRAIGHTS[len_compartment] if not s & ~union]
 
                     # These are stored for each compartment.
                     compartment_combinations.append(c_combinations)
-                    total_length += len_compartment
+
+                prune_incompatible_straights(compartment_combinations)
 
                 # If we have more than 1 compartment we make all the possible combinations that are legal.
-                col_unions = []
+                line_unions = []
                 legal_compartments = [[] for c in compartment_combinations]
-                for combinations in product(*compartment_combinations):
-                    union = set.union(*combinations)
-                    # Is a legal combination
-                    if len(union) == total_length:
-                        # Make a union for the row
-                        col_unions.append(union)
+                for combination in product(*compartment_combinations):
+                    union = 0
+                    for c in combination:
+                        # Straights that overlap are not a legal combination
+                        if c & union:
+                            break
+                        union |= c
+                    else:
+                        # Make a union for the line
+                        line_unions.append(union)
                         # Add the legal combinations to their compartment lists.
-                        for n, c in enumerate(combinations):
+                        for n, c in enumerate(combination):
                             legal_compartments[n].append(c)
 
-                col_union = set.intersection(*col_unions)
-                self.sure_candidates_by_cross_col[x].update(col_union)
+                if not line_unions:
+                    # No legal combination of straights fits - the board is dead.
+                    # Blame the line's first cell so the handler has a real coordinate.
+                    c = compartments[0][0]
+                    raise Board.InvalidSolution(c.x, c.y, "")
+                cross_bucket[key] |= reduce(and_, line_unions)
                 for n, legal_unions in enumerate(legal_compartments):
-                    compartment_union = set.union(*legal_unions)
-                    compartment_intersection = set.intersection(*legal_unions)
-                    for c in self.compartments_by_col[x][n]:
+                    compartment_union = reduce(or_, legal_unions, 0)
+                    compartment_intersection = reduce(and_, legal_unions, ALL_MASK)
+                    for c in compartments[n]:
                         if remove_unusable:
-                            for d in c.digits:
-                                if d not in compartment_union:
-                                    c.can_not_be(d)
-                        c.sure_candidates_by_col.update(compartment_intersection)
-                        c.sure_candidates_by_col.intersection_update(c.digits)
+                            c.can_not_be(c.mask & ~compartment_union)
+                        setattr(c, sc_attr, (getattr(c, sc_attr) | compartment_intersection) & c.mask)
             else:
-                for compartment in self.compartments_by_col[x]:
-                    union = set()
-                    for c in compartment:
-                        union.update(c.digits)
-
-                    index_min = ALL.index(min(union))
-                    index_max = ALL.index(max(union)) + 1  # Required for correct range
+                for compartment in compartments:
                     len_compartment = len(compartment)
-                    lowest_range = set(ALL[index_min : index_min + len_compartment])
-                    highest_range = set(ALL[index_max - len_compartment : index_max])
-                    intersection = lowest_range.intersection(highest_range)
+                    if len_compartment == 1:
+                        # A single-cell compartment is only sure once it is solved.
+                        c = compartment[0]
+                        if c.known:
+                            cross_bucket[key] |= c.mask
+                            setattr(c, sc_attr, getattr(c, sc_attr) | c.mask)
+                        continue
+
+                    union = reduce(or_, (c.mask for c in compartment), 0)
+
+                    index_min = (union & -union).bit_length() - 1
+                    index_max = union.bit_length()  # Required for correct range
+                    straight = (1 << len_compartment) - 1
+                    lowest_range = (straight << index_min) & ALL_MASK
+                    if index_max >= len_compartment:
+                        highest_range = straight << (index_max - len_compartment)
+                    else:
+                        highest_range = 0
+                    intersection = lowest_range & highest_range
 
                     if intersection:
                         # Add the sure candidates to each cell assuming they're present.
-                        self.sure_candidates_by_cross_col[x].update(intersection)
+                        cross_bucket[key] |= intersection
                         for c in compartment:
-                            # Add the intersection to each cell.
-                            c.sure_candidates_by_col.update(intersection)
-                            # Remove any that aren't possible.
-                            c.sure_candidates_by_col.intersection_update(c.digits)
+                            # Add the intersection to each cell, removing any that aren't possible.
+                            setattr(c, sc_attr, (getattr(c, sc_attr) | intersection) & c.mask)
 
     ######################################################################################################################
 
     def __str__(self):
         lines = ["  123456789"]
         for y in DOWN:
-            line = "".join([str(self[x, y]) for x in ACROSS])
+            line = "".join([self[x, y].pretty() for x in ACROSS])
             lines.append("%s %s" % (y, line))
         return "\n".join(lines)
 
@@ -757,8 +857,8 @@ class Board(dict):
             for x in ACROSS:
                 sc = getattr(self[x, y], sc_attribute)
                 parts = []
-                for d in ALL:
-                    if d in sc:
+                for n, d in enumerate(ALL):
+                    if sc & (1 << n):
                         parts.append(d)
                     else:
                         parts.append(" ")
@@ -781,7 +881,7 @@ class Board(dict):
                 else:
                     break
 
-            parts = [repr(self[x, y]) for x in ACROSS]
+            parts = [self[x, y].pretty_full() for x in ACROSS]
             line = "\033[40m│\033[0m".join(parts)
             lines.append("%s \033[40m│\033[0m%s\033[40m│\033[0m" % (y, line))
             if sure_candidates:
@@ -793,8 +893,8 @@ class Board(dict):
         return "\n".join(lines)
 
     def _clear_removed(self):
-        for v in self.values():
-            v.removed.clear()
+        for v in self.cells:
+            v.removed = 0
 
     def _dump_compartments(self):
         lines = []
@@ -805,445 +905,442 @@ class Board(dict):
         return "\n".join(lines)
 
     def _completeness(self):
-        completeness = 0
-        for c in self.values():
-            if c.is_known():
-                completeness += 9
-            else:
-                completeness += 9 - len(c.digits)
-        return completeness
+        # 729 minus the open candidates; solved cells score the full 9.
+        # The cells keep the tally up to date as their masks shrink.
+        return self._completeness_val
 
     class InvalidSolution(Exception):
         pass
 
     def _valid(self):
-        for _, c in self.items():
-            if c.is_white():
-                if len(c.digits) == 0:
-                    raise Board.InvalidSolution(x, y, c.digits)
+        for (x, y), c in self._white_items:
+            if c.mask == 0:
+                raise Board.InvalidSolution(x, y, "")
 
         for y in DOWN:
-            seen = set()
-            for x in ACROSS:
-                c = self[x, y]
-                if c.is_known():
-                    d = c.value()
-                    if d in seen:
-                        raise Board.InvalidSolution(x, y, d)
-                    else:
-                        seen.add(d)
+            seen = 0
+            for x, c in zip(ACROSS, self._row_cells[y]):
+                if c.known:
+                    d = c.mask
+                    if seen & d:
+                        raise Board.InvalidSolution(x, y, MASK_TO_DIGIT[d])
+                    seen |= d
 
         for x in ACROSS:
-            seen = set()
-            for y in DOWN:
-                c = self[x, y]
-                if c.is_known():
-                    d = c.value()
-                    if d in seen:
-                        raise Board.InvalidSolution(x, y, d)
-                    else:
-                        seen.add(d)
+            seen = 0
+            for y, c in zip(DOWN, self._col_cells[x]):
+                if c.known:
+                    d = c.mask
+                    if seen & d:
+                        raise Board.InvalidSolution(x, y, MASK_TO_DIGIT[d])
+                    seen |= d
 
     def __eq__(self, other):
+        # Normalise the expectation into a full 9x9 grid once, rather than raising
+        # and catching an exception for every missing cell.
+        expected = [[BLACK] * 9 for _ in range(9)]
+        for ny, row in enumerate(other[:9]):
+            for nx, digits in enumerate(row[:9]):
+                expected[ny][nx] = digits
         for ny, y in enumerate(DOWN):
             for nx, x in enumerate(ACROSS):
-                try:
-                    digits = other[ny][nx]
-                except:
-                    digits = BLACK
-                if self[x, y].match(digits):
-                    pass
-                else:
-                    _fail("{}{} is {} expected {}".format(x, y, "".join(self[x, y].digits), digits))
+                digits = expected[ny][nx]
+                if not self[x, y].match(digits):
+                    _fail("{}{} is {} expected {}".format(x, y, "".join(digits_of(self[x, y].mask)), digits))
                     return False
         return True
 
     ######################################################################################################################
 
+    def _mark_dirty(self, cell):
+        for lines in self._dirty_by_row.values():
+            lines.add(cell.y)
+        for lines in self._dirty_by_col.values():
+            lines.add(cell.x)
+
+    def _dirty_rows(self, name):
+        lines = self._dirty_by_row.get(name)
+        if lines is None:
+            lines = self._dirty_by_row[name] = set(DOWN)
+        return lines
+
+    def _dirty_cols(self, name):
+        lines = self._dirty_by_col.get(name)
+        if lines is None:
+            lines = self._dirty_by_col[name] = set(ACROSS)
+        return lines
+
     def remove_used_digits(self):
-        for (cx, cy), c in self.items():
-            if c.is_known() and (cx, cy) not in self._known_cells:
-                cn = c.value()
-                for x in ACROSS:
-                    self[x, cy].can_not_be(cn)
-                for y in DOWN:
-                    self[cx, y].can_not_be(cn)
-                self._known_cells[cx, cy] = c
+        # Drain the newly-known cells instead of rescanning the whole board;
+        # eliminations during the drain can push further cells onto the set.
+        cells = self.cells
+        pending = self._pending_known
+        while pending:
+            n = pending.pop()
+            if n in self._known_cells:
+                continue
+            c = cells[n]
+            cn = c.mask
+            col = n % 9
+            for dn in range(n - col, n - col + 9):
+                cells[dn].can_not_be(cn)
+            for dn in range(col, 81, 9):
+                cells[dn].can_not_be(cn)
+            self._known_cells[n] = c
 
     def compartment_range_check_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
-            compartment_range_check_by_cells(compartment)
+        dirty = self._dirty_rows("compartment_range_check")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_row:
+            if compartment[0].y in lines:
+                compartment_range_check_by_cells(compartment)
 
     def compartment_range_check_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
-            compartment_range_check_by_cells(compartment)
+        dirty = self._dirty_cols("compartment_range_check")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_col:
+            if compartment[0].x in lines:
+                compartment_range_check_by_cells(compartment)
 
     def sure_candidates_by_row(self):
         self._sure_candidates_by_row(True)
-        for y, compartment in self._iter_compartments_by_row():
-            sure_candidates_by_cells(compartment, [self[x, y] for x in ACROSS], Cell.get_sc_by_row)
+        for compartment in self.all_compartments_by_row:
+            sure_candidates_by_cells(compartment, self._outside_by_row[id(compartment)], Cell.get_sc_by_row)
 
     def sure_candidates_by_col(self):
         self._sure_candidates_by_col(True)
-        for x, compartment in self._iter_compartments_by_col():
-            sure_candidates_by_cells(compartment, [self[x, y] for y in DOWN], Cell.get_sc_by_col)
+        for compartment in self.all_compartments_by_col:
+            sure_candidates_by_cells(compartment, self._outside_by_col[id(compartment)], Cell.get_sc_by_col)
 
     def singles_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
+        for compartment in self.all_compartments_by_row:
             singles_by_cell(compartment, Cell.get_sc_by_row)
 
     def singles_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
+        for compartment in self.all_compartments_by_col:
             singles_by_cell(compartment, Cell.get_sc_by_col)
 
     def stranded_digits_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
-            stranded_digits_by_cells(compartment)
+        dirty = self._dirty_rows("stranded_digits")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_row:
+            if compartment[0].y in lines:
+                stranded_digits_by_cells(compartment)
 
     def stranded_digits_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
-            stranded_digits_by_cells(compartment)
+        dirty = self._dirty_cols("stranded_digits")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_col:
+            if compartment[0].x in lines:
+                stranded_digits_by_cells(compartment)
 
     def bridging_digits_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
-            bridging_digits_by_cells(compartment)
+        dirty = self._dirty_rows("bridging_digits")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_row:
+            if compartment[0].y in lines:
+                bridging_digits_by_cells(compartment)
 
     def bridging_digits_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
-            bridging_digits_by_cells(compartment)
+        dirty = self._dirty_cols("bridging_digits")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_col:
+            if compartment[0].x in lines:
+                bridging_digits_by_cells(compartment)
 
     def stranded_by_bridge_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
-            stranded_by_bridge_by_cells(compartment)
+        dirty = self._dirty_rows("stranded_by_bridge")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_row:
+            if compartment[0].y in lines:
+                stranded_by_bridge_by_cells(compartment)
 
     def stranded_by_bridge_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
-            stranded_by_bridge_by_cells(compartment)
+        dirty = self._dirty_cols("stranded_by_bridge")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_col:
+            if compartment[0].x in lines:
+                stranded_by_bridge_by_cells(compartment)
 
     def split_compartments_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
-            split_compartments_by_cells(compartment)
+        dirty = self._dirty_rows("split_compartments")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_row:
+            if compartment[0].y in lines:
+                split_compartments_by_cells(compartment)
 
     def split_compartments_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
-            split_compartments_by_cells(compartment)
+        dirty = self._dirty_cols("split_compartments")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_col:
+            if compartment[0].x in lines:
+                split_compartments_by_cells(compartment)
 
     def mind_the_gap_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
-            mind_the_gap_by_cells(compartment)
+        dirty = self._dirty_rows("mind_the_gap")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_row:
+            if compartment[0].y in lines:
+                mind_the_gap_by_cells(compartment)
 
     def mind_the_gap_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
-            mind_the_gap_by_cells(compartment)
+        dirty = self._dirty_cols("mind_the_gap")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_col:
+            if compartment[0].x in lines:
+                mind_the_gap_by_cells(compartment)
 
     def mind_the_bridging_gap_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
-            mind_the_bridging_gap_by_cells(compartment)
+        dirty = self._dirty_rows("mind_the_bridging_gap")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_row:
+            if compartment[0].y in lines:
+                mind_the_bridging_gap_by_cells(compartment)
 
     def mind_the_bridging_gap_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
-            mind_the_bridging_gap_by_cells(compartment)
+        dirty = self._dirty_cols("mind_the_bridging_gap")
+        lines = dirty.copy()
+        dirty.clear()
+        for compartment in self.all_compartments_by_col:
+            if compartment[0].x in lines:
+                mind_the_bridging_gap_by_cells(compartment)
 
     def naked_groups_by_row(self):
+        dirty = self._dirty_rows("naked_groups")
+        lines = dirty.copy()
+        dirty.clear()
         for y in DOWN:
-            naked_groups_by_cells([self[x, y] for x in ACROSS if self[x, y].is_unknown()])
+            if y in lines:
+                naked_groups_by_cells([c for c in self._row_cells[y] if c.is_unknown()])
 
     def naked_groups_by_col(self):
+        dirty = self._dirty_cols("naked_groups")
+        lines = dirty.copy()
+        dirty.clear()
         for x in ACROSS:
-            naked_groups_by_cells([self[x, y] for y in DOWN if self[x, y].is_unknown()])
+            if x in lines:
+                naked_groups_by_cells([c for c in self._col_cells[x] if c.is_unknown()])
 
     def hidden_group_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
+        for compartment in self.all_compartments_by_row:
             hidden_group_by_cells(compartment, Cell.get_sc_by_row)
 
     def hidden_group_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
+        for compartment in self.all_compartments_by_col:
             hidden_group_by_cells(compartment, Cell.get_sc_by_col)
 
     def hidden_group_cross_by_row(self):
         for y in DOWN:
-            hidden_group_by_cross_cells([self[x, y] for x in ACROSS], self.sure_candidates_by_cross_row[y])
+            hidden_group_by_cross_cells(self._row_cells[y], self.sure_candidates_by_cross_row[y])
 
     def hidden_group_cross_by_col(self):
         for x in ACROSS:
-            hidden_group_by_cross_cells([self[x, y] for y in DOWN], self.sure_candidates_by_cross_col[x])
-
-    def sea_creatures_by_row(self):
-        def _sea_creatures_by_row(d):
+            hidden_group_by_cross_cells(self._col_cells[x], self.sure_candidates_by_cross_col[x])
+
+    def _sea_creatures(
+        self, line_labels, pos_labels, line_cells, pos_cells, cross_line, cross_pos, sc_fn, pos_sc_attr, pos_compartment_attr, from_cross
+    ):
+        # The four public variants differ only in orientation (are the lines rows
+        # or columns?) and in whether the candidates come from the cells' sure
+        # candidates or from the cross sets.
+        def _sea_creatures_one(d, lines, cand_masks):
             hit = False
-            d_sure_candidates = {}
-            for y in DOWN:
-                candidates = set(
-                    [x for x in ACROSS if self[x, y].is_unknown() and d in self[x, y].sure_candidates_by_row]
-                )
-                if candidates:
-                    d_sure_candidates[y] = candidates
-
-            # ??? Is it better to search from large to small?
-            for r in range(2, len(d_sure_candidates) + 1):
-                for combination in combinations(d_sure_candidates, r):
-                    # Merge the combinations
-                    d_sure_union = set()
-                    for c in combination:
-                        d_sure_union.update(d_sure_candidates[c])
-
-                    if len(d_sure_union) == r:
-                        # We have a sea creature
-                        # We can remove 'd' from all the other rows not included this combination that ..
-                        # ... have 'd's in the union col.
-                        for x in d_sure_union:
-                            self.sure_candidates_by_cross_col[x].add(d)
-                            for y in DOWN:
-                                if y in combination:
-                                    assert d in self.sure_candidates_by_cross_row[y]
-                                    if d in self[x, y].digits:
-                                        assert d in self[x, y].sure_candidates_by_row
-                                elif d in self[x, y].digits:
-                                    self[x, y].can_not_be(d)
-                                    hit = True
+            for found, union in find_sea_creatures(cand_masks):
+                # We have a sea creature
+                combination = [lines[i] for i in found]
+                d_sure_union = [pos_labels[n] for n in range(9) if union >> n & 1]
+                r = len(combination)
+                # We can remove 'd' from all the other lines not included this combination that ..
+                # ... have 'd's in the union positions.
+                for p in d_sure_union:
+                    if not from_cross:
+                        cross_pos[p] |= d
+                    for l, c in zip(line_labels, pos_cells[p]):
+                        if l in combination:
+                            if not from_cross:
+                                assert cross_line[l] & d
+                                if c.mask & d:
+                                    assert sc_fn(c) & d
+                        elif c.mask & d:
+                            c.can_not_be(d)
+                            hit = True
 
-                        if hit:
-                            # Count the compartments.
-                            compartments_found = list()
-                            for x in d_sure_union:
-                                for compartment in self.compartments_by_col[x]:
-                                    for y in combination:
-                                        if self[x, y] in compartment and compartment not in compartments_found:
-                                            compartments_found.append(compartment)
-                            # If the hits are all in the same compartments then they become sure candidates.
-                            if len(compartments_found) == r:
-                                for x in d_sure_union:
-                                    for y in combination:
-                                        if d in self[x, y].digits:
-                                            self[x, y].sure_candidates_by_col.add(d)
-                                            self.sure_candidates_by_cross_col[x].add(d)
-                            return hit
+                if hit:
+                    # Count the compartments.
+                    compartments_found = set()
+                    for p in d_sure_union:
+                        for l, c in zip(line_labels, pos_cells[p]):
+                            if l in combination:
+                                compartment = getattr(c, pos_compartment_attr)
+                                if compartment is not None:
+                                    compartments_found.add(id(compartment))
+                    # If the hits are all in the same compartments then they become sure candidates.
+                    if len(compartments_found) == r:
+                        for p in d_sure_union:
+                            for l, c in zip(line_labels, pos_cells[p]):
+                                if l in combination and c.mask & d:
+                                    setattr(c, pos_sc_attr, getattr(c, pos_sc_attr) | d)
+                                    cross_pos[p] |= d
+                    return hit
             return hit
 
-        for d in ALL:
-            if _sea_creatures_by_row(d):
+        # One board sweep builds the candidate positions for every digit.
+        lines = [[] for _ in range(9)]
+        cand_masks = [[] for _ in range(9)]
+        for l in line_labels:
+            if from_cross:
+                cross = cross_line[l]
+                if not cross:
+                    continue
+            candidates = [0] * 9
+            for n, c in enumerate(line_cells[l]):
+                if from_cross:
+                    sc = c.mask & cross
+                elif c.is_unknown():
+                    sc = sc_fn(c)
+                else:
+                    continue
+                while sc:
+                    b = sc & -sc
+                    sc ^= b
+                    candidates[b.bit_length() - 1] |= 1 << n
+            for nd in range(9):
+                if candidates[nd]:
+                    lines[nd].append(l)
+                    cand_masks[nd].append(candidates[nd])
+
+        for nd, d in enumerate(ALL_BITS):
+            # A sea creature spans at least two lines.
+            if len(lines[nd]) < 2:
+                continue
+            if _sea_creatures_one(d, lines[nd], cand_masks[nd]):
                 break
 
-    def sea_creatures_by_col(self):
-        def _sea_creatures_by_col(d):
-            hit = False
-            d_sure_candidates = {}
-            for x in ACROSS:
-                candidates = set(
-                    [y for y in DOWN if self[x, y].is_unknown() and d in self[x, y].sure_candidates_by_col]
-                )
-                if candidates:
-                    d_sure_candidates[x] = candidates
-
-            # ??? Is it better to search from large to small?
-            for r in range(2, len(d_sure_candidates) + 1):
-                for combination in combinations(d_sure_candidates, r):
-                    # Merge the combinations
-                    d_sure_union = set()
-                    for c in combination:
-                        d_sure_union.update(d_sure_candidates[c])
-                    if len(d_sure_union) == r:
-                        # We have a sea creature
-                        # We can remove 'd' from all the other rows not included this combination that ..
-                        # ... have 'd's in the union row.
-                        for y in d_sure_union:
-                            self.sure_candidates_by_cross_row[y].add(d)
-                            for x in ACROSS:
-                                if x in combination:
-                                    assert d in self.sure_candidates_by_cross_col[x]
-                                    if d in self[x, y].digits:
-                                        assert d in self[x, y].sure_candidates_by_col
-                                elif d in self[x, y].digits:
-                                    self[x, y].can_not_be(d)
-                                    hit = True
-
-                        if hit:
-                            # Count the compartments.
-                            compartments_found = list()
-                            for y in d_sure_union:
-                                for compartment in self.compartments_by_row[y]:
-                                    for x in combination:
-                                        if self[x, y] in compartment and compartment not in compartments_found:
-                                            compartments_found.append(compartment)
-                            # If the hits are all in the same compartments then they become sure candidates.
-                            if len(compartments_found) == r:
-                                for y in d_sure_union:
-                                    for x in combination:
-                                        if d in self[x, y].digits:
-                                            self[x, y].sure_candidates_by_row.add(d)
-                                            self.sure_candidates_by_cross_row[y].add(d)
-                            return hit
-            return hit
+    def sea_creatures_by_row(self):
+        self._sea_creatures(
+            DOWN,
+            ACROSS,
+            self._row_cells,
+            self._col_cells,
+            self.sure_candidates_by_cross_row,
+            self.sure_candidates_by_cross_col,
+            Cell.get_sc_by_row,
+            "sure_candidates_by_col",
+            "compartment_by_col",
+            False,
+        )
 
-        for d in ALL:
-            if _sea_creatures_by_col(d):
-                break
+    def sea_creatures_by_col(self):
+        self._sea_creatures(
+            ACROSS,
+            DOWN,
+            self._col_cells,
+            self._row_cells,
+            self.sure_candidates_by_cross_col,
+            self.sure_candidates_by_cross_row,
+            Cell.get_sc_by_col,
+            "sure_candidates_by_row",
+            "compartment_by_row",
+            False,
+        )
 
     def sea_creatures_cross_by_row(self):
-        def _sea_creatures_cross_by_row(d):
-            hit = False
-            d_sure_candidates = {}
-            for y in DOWN:
-                if d in self.sure_candidates_by_cross_row[y]:
-                    candidates = set([x for x in ACROSS if d in self[x, y].digits])
-                    if candidates:
-                        d_sure_candidates[y] = candidates
-
-            # ??? Is it better to search from large to small?
-            for r in range(2, len(d_sure_candidates) + 1):
-                for combination in combinations(d_sure_candidates, r):
-                    # Merge the combinations
-                    d_sure_union = set()
-                    for c in combination:
-                        d_sure_union.update(d_sure_candidates[c])
-                    if len(d_sure_union) == r:
-                        # We have a sea creature
-                        # We can remove 'd' from all the other rows not included this combination that ..
-                        # ... have 'd's in the union row.
-                        for x in d_sure_union:
-                            for y in DOWN:
-                                if y not in combination:
-                                    if d in self[x, y].digits:
-                                        self[x, y].can_not_be(d)
-                                        hit = True
-
-                        if hit:
-                            # Count the compartments.
-                            compartments_found = list()
-                            for x in d_sure_union:
-                                for compartment in self.compartments_by_col[x]:
-                                    for y in combination:
-                                        if self[x, y] in compartment and compartment not in compartments_found:
-                                            compartments_found.append(compartment)
-                            # If the hits are all in the same compartments then they become sure candidates.
-                            if len(compartments_found) == r:
-                                for x in d_sure_union:
-                                    for y in combination:
-                                        if d in self[x, y].digits:
-                                            self[x, y].sure_candidates_by_col.add(d)
-                                            self.sure_candidates_by_cross_col[x].add(d)
-                            return hit
-            return hit
-
-        for d in ALL:
-            if _sea_creatures_cross_by_row(d):
-                break
+        self._sea_creatures(
+            DOWN,
+            ACROSS,
+            self._row_cells,
+            self._col_cells,
+            self.sure_candidates_by_cross_row,
+            self.sure_candidates_by_cross_col,
+            Cell.get_sc_by_row,
+            "sure_candidates_by_col",
+            "compartment_by_col",
+            True,
+        )
 
     def sea_creatures_cross_by_col(self):
-        def _sea_creatures_cross_by_col(d):
-            hit = False
-            d_sure_candidates = {}
-            for x in ACROSS:
-                if d in self.sure_candidates_by_cross_col[x]:
-                    candidates = set([y for y in DOWN if d in self[x, y].digits])
-                    if candidates:
-                        d_sure_candidates[x] = candidates
-
-            # ??? Is it better to search from large to small?
-            for r in range(2, len(d_sure_candidates) + 1):
-                for combination in combinations(d_sure_candidates, r):
-                    # Merge the combinations
-                    d_sure_union = set()
-                    for c in combination:
-                        d_sure_union.update(d_sure_candidates[c])
-                    if len(d_sure_union) == r:
-                        # We have a sea creature
-                        # We can remove 'd' from all the other rows not included this combination that ..
-                        # ... have 'd's in the union row.
-                        for y in d_sure_union:
-                            for x in ACROSS:
-                                if x not in combination:
-                                    if d in self[x, y].digits:
-                                        self[x, y].can_not_be(d)
-                                        hit = True
-
-                        if hit:
-                            # Count the compartments.
-                            compartments_found = list()
-                            for y in d_sure_union:
-                                for compartment in self.compartments_by_row[y]:
-                                    for x in combination:
-                                        if self[x, y] in compartment and compartment not in compartments_found:
-                                            compartments_found.append(compartment)
-                            # If the hits are all in the same compartments then they become sure candidates.
-                            if len(compartments_found) == r:
-                                for y in d_sure_union:
-                                    for x in combination:
-                                        if d in self[x, y].digits:
-                                            self[x, y].sure_candidates_by_row.add(d)
-                                            self.sure_candidates_by_cross_row[y].add(d)
-                            return hit
-            return hit
-
-        for d in ALL:
-            if _sea_creatures_cross_by_col(d):
-                break
+        self._sea_creatures(
+            ACROSS,
+            DOWN,
+            self._col_cells,
+            self._row_cells,
+            self.sure_candidates_by_cross_col,
+            self.sure_candidates_by_cross_row,
+            Cell.get_sc_by_col,
+            "sure_candidates_by_row",
+            "compartment_by_row",
+            True,
+        )
 
     def settis_rule(self):
-        def _count_sure_candidates_by_row(d):
-            sc = {"yes": set(), "no": set(), "maybe": set()}
+        # One sweep per line classifies every digit at once: a digit is a 'yes'
+        # when known or sure, a 'no' when no cell can hold it, else a 'maybe'.
+        infos = {}
+
+        def _line_info(cells, cross):
+            known_union = 0
+            total_union = 0
+            for c in cells:
+                total_union |= c.mask
+                if c.known:
+                    known_union |= c.mask
+            yes = known_union | (total_union & ~known_union & cross)
+            no = ALL_MASK & ~total_union
+            return yes, no
+
+        def _refresh():
             for y in DOWN:
-                no = True
-                for x in ACROSS:
-                    c = self[x, y]
-                    # If any of the cells is 'd' we can flag it as a 'yes'.
-                    if c.is_known() and c.value() == d:
-                        sc["yes"].add(y)
-                        break
-                    elif d in c.digits:
-                        no = False
-                else:
-                    # If we didn't see 'd' then flag it as 'no'
-                    if no:
-                        sc["no"].add(y)
-                    else:
-                        # This tests for sc by compartment
-                        if d in self.sure_candidates_by_cross_row[y]:
-                            sc["yes"].add(y)
-                        else:
-                            sc["maybe"].add(y)
-
-            assert len(sc["yes"]) + len(sc["no"]) + len(sc["maybe"]) == 9
-            return sc
-
-        def _count_sure_candidates_by_col(d):
-            sc = {"yes": set(), "no": set(), "maybe": set()}
+                infos[y] = _line_info(self._row_cells[y], self.sure_candidates_by_cross_row[y])
             for x in ACROSS:
-                no = True
-                for y in DOWN:
-                    c = self[x, y]
-                    # If any of the cells is 'd' we can flag it as a 'yes'.
-                    if c.is_known() and c.value() == d:
-                        sc["yes"].add(x)
-                        break
-                    elif d in c.digits:
-                        no = False
-                else:
-                    # If we didn't see 'd' then flag it as 'no'
-                    if no:
-                        sc["no"].add(x)
-                    else:
-                        # This tests for sc by compartment
-                        if d in self.sure_candidates_by_cross_col[x]:
-                            sc["yes"].add(x)
-                        else:
-                            sc["maybe"].add(x)
+                infos[x] = _line_info(self._col_cells[x], self.sure_candidates_by_cross_col[x])
 
-            assert len(sc["yes"]) + len(sc["no"]) + len(sc["maybe"]) == 9
-            return sc
+        _refresh()
 
         def _settis_rule(d):
             hit = False
 
-            sc_by_row = _count_sure_candidates_by_row(d)
-            sc_by_col = _count_sure_candidates_by_col(d)
-            row_yes, row_maybe, row_no = sc_by_row["yes"], sc_by_row["maybe"], sc_by_row["no"]
-            col_yes, col_maybe, col_no = sc_by_col["yes"], sc_by_col["maybe"], sc_by_col["no"]
+            row_yes, row_maybe, row_no = [], [], []
+            for y in DOWN:
+                yes, no = infos[y]
+                if yes & d:
+                    row_yes.append(y)
+                elif no & d:
+                    row_no.append(y)
+                else:
+                    row_maybe.append(y)
+            col_yes, col_maybe, col_no = [], [], []
+            for x in ACROSS:
+                yes, no = infos[x]
+                if yes & d:
+                    col_yes.append(x)
+                elif no & d:
+                    col_no.append(x)
+                else:
+                    col_maybe.append(x)
 
             if False:
                 print(
                     "d:{} row[y{}-m{}-n{}] col[y{}-m{}-n{}]".format(
-                        d, len(row_yes), len(row_maybe), len(row_no), len(col_yes), len(col_maybe), len(col_no)
+                        MASK_TO_DIGIT[d],
+                        len(row_yes),
+                        len(row_maybe),
+                        len(row_no),
+                        len(col_yes),
+                        len(col_maybe),
+                        len(col_no),
                     )
                 )
                 print("rY:", row_yes)
@@ -1271,26 +1368,27 @@ class Board(dict):
                 # If rY == cY then we know all the cM should be cN.
                 if len(row_yes) == len(col_yes):
                     for x in col_maybe:
-                        assert d not in self.sure_candidates_by_cross_col[x]
-                        for y in DOWN:
-                            assert d not in self[x, y].sure_candidates_by_col
-                            self[x, y].can_not_be(d)
+                        assert not self.sure_candidates_by_cross_col[x] & d
+                        for c in self._col_cells[x]:
+                            assert not c.sure_candidates_by_col & d
+                            c.can_not_be(d)
+                    _refresh()
                 # If rN == cN then we know all the cM should be cY.
                 elif len(row_no) == len(col_no):
                     for x in col_maybe:
                         d_compartment_count = 0
                         for compartment in self.compartments_by_col[x]:
                             for c in compartment:
-                                if d in c.digits:
+                                if c.mask & d:
                                     d_compartment_count += 1
                                     break
                         if d_compartment_count == 1:
-                            for y in DOWN:
-                                if (d in self[x, y].digits) and (d not in self[x, y].sure_candidates_by_col):
-                                    self[x, y].sure_candidates_by_col.add(d)
+                            for c in self._col_cells[x]:
+                                if c.mask & d and not c.sure_candidates_by_col & d:
+                                    c.sure_candidates_by_col |= d
                                     hit = True
-                        if d not in self.sure_candidates_by_cross_col[x]:
-                            self.sure_candidates_by_cross_col[x].add(d)
+                        if not self.sure_candidates_by_cross_col[x] & d:
+                            self.sure_candidates_by_cross_col[x] |= d
                             hit = True
 
             # If the #maybe in the coll is 0, then ...
@@ -1300,57 +1398,54 @@ class Board(dict):
                 # If rY == cY then we know all the cM should be cN.
                 if len(col_yes) == len(row_yes):
                     for y in row_maybe:
-                        assert d not in self.sure_candidates_by_cross_row[y]
-                        for x in ACROSS:
-                            assert d not in self[x, y].sure_candidates_by_row
-                            self[x, y].can_not_be(d)
+                        assert not self.sure_candidates_by_cross_row[y] & d
+                        for c in self._row_cells[y]:
+                            assert not c.sure_candidates_by_row & d
+                            c.can_not_be(d)
+                    _refresh()
                 # If rN == cN then we know all the cM should be cY.
                 elif len(row_no) == len(col_no):
                     for y in row_maybe:
                         d_compartment_count = 0
                         for compartment in self.compartments_by_row[y]:
                             for c in compartment:
-                                if d in c.digits:
+                                if c.mask & d:
                                     d_compartment_count += 1
                                     break
                         if d_compartment_count == 1:
-                            for x in ACROSS:
-                                if (d in self[x, y].digits) and (d not in self[x, y].sure_candidates_by_row):
-                                    self[x, y].sure_candidates_by_row.add(d)
+                            for c in self._row_cells[y]:
+                                if c.mask & d and not c.sure_candidates_by_row & d:
+                                    c.sure_candidates_by_row |= d
                                     hit = True
-                        if d not in self.sure_candidates_by_cross_row[y]:
-                            self.sure_candidates_by_cross_row[y].add(d)
+                        if not self.sure_candidates_by_cross_row[y] & d:
+                            self.sure_candidates_by_cross_row[y] |= d
                             hit = True
 
             return hit
 
-        return any(map(_settis_rule, ALL))
+        return any(map(_settis_rule, ALL_BITS))
 
     def unique_rectangle_rule(self):
-        for (x, y), c in self.items():
-            if len(c.digits) == 2:
+        for (x, y), c in self._white_items:
+            if POPCOUNT(c.mask) == 2:
                 for dy in DOWN:
                     if dy == y:
                         continue
                     d = self[x, dy]
-                    if len(d.digits) == 2 and c.digits == d.digits:
+                    if POPCOUNT(d.mask) == 2 and c.mask == d.mask:
                         # Pair
                         for dx in ACROSS:
                             if dx == x:
                                 continue
                             d1, d2 = self[dx, y], self[dx, dy]
                             if d1.is_unknown() and d2.is_unknown():
-                                for d in c.digits:
-                                    if d not in d1.digits or d not in d2.digits:
-                                        break
-                                else:
-                                    if len(d1.digits) == 2:
-                                        d2.can_not_be(d1.digits)
-                                    elif len(d2.digits) == 2:
-                                        d1.can_not_be(d2.digits)
-                                    elif len(d1.digits) == 3 and len(d2.digits) == 3 and d1.digits == d2.digits:
-                                        digits = set(d1.digits)
-                                        digits.difference_update(c.digits)
+                                if not c.mask & ~d1.mask and not c.mask & ~d2.mask:
+                                    if POPCOUNT(d1.mask) == 2:
+                                        d2.can_not_be(d1.mask)
+                                    elif POPCOUNT(d2.mask) == 2:
+                                        d1.can_not_be(d2.mask)
+                                    elif POPCOUNT(d1.mask) == 3 and d1.mask == d2.mask:
+                                        digits = d1.mask & ~c.mask
                                         for other_y in DOWN:
                                             if other_y == y or other_y == dy:
                                                 continue
@@ -1360,24 +1455,20 @@ class Board(dict):
                     if dx == x:
                         continue
                     d = self[dx, y]
-                    if len(d.digits) == 2 and c.digits == d.digits:
+                    if POPCOUNT(d.mask) == 2 and c.mask == d.mask:
                         # Pair
                         for dy in DOWN:
                             if dy == y:
                                 continue
                             d1, d2 = self[x, dy], self[dx, dy]
                             if d1.is_unknown() and d2.is_unknown():
-                                for d in c.digits:
-                                    if d not in d1.digits or d not in d2.digits:
-                                        break
-                                else:
-                                    if len(d1.digits) == 2:
-                                        d2.can_not_be(d1.digits)
-                                    elif len(d2.digits) == 2:
-                                        d1.can_not_be(d2.digits)
-                                    elif len(d1.digits) == 3 and len(d2.digits) == 3 and d1.digits == d2.digits:
-                                        digits = set(d1.digits)
-                                        digits.difference_update(c.digits)
+                                if not c.mask & ~d1.mask and not c.mask & ~d2.mask:
+                                    if POPCOUNT(d1.mask) == 2:
+                                        d2.can_not_be(d1.mask)
+                                    elif POPCOUNT(d2.mask) == 2:
+                                        d1.can_not_be(d2.mask)
+                                    elif POPCOUNT(d1.mask) == 3 and d1.mask == d2.mask:
+                                        digits = d1.mask & ~c.mask
                                         for other_x in ACROSS:
                                             if other_x == x or other_x == dx:
                                                 continue
@@ -1388,123 +1479,184 @@ class Board(dict):
         # Needs a better implementation.
 
         # First we search for compartments that are isolated.
-        candidates = []
-        for _, compartment in self._iter_compartments_by_row():
+        candidates = set()
+        for compartment in self.all_compartments_by_row:
             if len(compartment) == 1:
                 cell = compartment[0]
-                if len(cell.digits) == 2:
-                    candidates.append(cell)
-        singles = []
-        for _, compartment in self._iter_compartments_by_col():
+                if POPCOUNT(cell.mask) == 2:
+                    candidates.add(id(cell))
+        singles = set()
+        for compartment in self.all_compartments_by_col:
             if len(compartment) == 1:
                 cell = compartment[0]
-                if cell in candidates:
-                    singles.append(cell)
+                if id(cell) in candidates:
+                    singles.add(id(cell))
         if singles:
-            # This is a list of the isolated compartments
-            for (x, y), c in self.items():
-                if c in singles:
-                    # We want to find a digit that is isolated
-                    compartments_with_digit = DefaultDict(list)
-                    for d in c.digits:
-                        for compartment in self.compartments_by_row[y]:
-                            if c not in compartment:
-                                for dc in compartment:
-                                    if d in dc.digits:
-                                        compartments_with_digit[d].append((compartment, Cell.get_sc_by_row))
-                                        break
-                        for compartment in self.compartments_by_col[x]:
-                            if c not in compartment:
-                                for dc in compartment:
-                                    if d in dc.digits:
-                                        compartments_with_digit[d].append((compartment, Cell.get_sc_by_col))
-                                        break
+            # This is a set of the isolated compartments
+            for (x, y), c in self._white_items:
+                if id(c) in singles:
+                    # We want to find a digit that is isolated - one compartment
+                    # union per line tells us which of our digits it touches
+                    touched = 0
+                    touching = []
+                    for compartment in self.compartments_by_row[y]:
+                        if c.compartment_by_row is not compartment:
+                            hits = c.mask & reduce(or_, (dc.mask for dc in compartment), 0)
+                            if hits:
+                                touched |= hits
+                                touching.append((compartment, "sure_candidates_by_row"))
+                    for compartment in self.compartments_by_col[x]:
+                        if c.compartment_by_col is not compartment:
+                            hits = c.mask & reduce(or_, (dc.mask for dc in compartment), 0)
+                            if hits:
+                                touched |= hits
+                                touching.append((compartment, "sure_candidates_by_col"))
                     # What if two compartments touch this digit?
-                    if len(compartments_with_digit) == 1:
-                        for digit, pack in compartments_with_digit.items():
-                            compartment, sc_fn = pack[0]
-                            c.can_not_be(digit)
-                            for dc in compartment:
-                                if digit in dc.digits:
-                                    sc_fn(dc).add(digit)
+                    if POPCOUNT(touched) == 1:
+                        digit = touched
+                        compartment, sc_attr = touching[0]
+                        c.can_not_be(digit)
+                        for dc in compartment:
+                            if dc.mask & digit:
+                                setattr(dc, sc_attr, getattr(dc, sc_attr) | digit)
 
     def y_wing(self):
-        for (x, y), c in self.items():
-            if len(c.digits) == 2:
-                c0, c1 = c.digits[0], c.digits[1]
-                # This might be a candidate for BLUE.
-                for (dx, dy), dc in self._iter_all_but(x, y):
-                    if (
-                        dc.is_unknown()
-                        and (len(self[dx, y].digits) == 2)
-                        and (len(self[x, dy].digits) == 2)
-                        and (
-                            ((c0 in self[dx, y].digits) and (c1 in self[x, dy].digits))
-                            or ((c1 in self[dx, y].digits) and (c0 in self[x, dy].digits))
-                        )
-                    ):
-                        z0 = set(self[dx, y].digits).difference(c.digits)
-                        z1 = set(self[x, dy].digits).difference(c.digits)
-                        if len(z0) == 1 and z0 == z1:
-                            dc.can_not_be(z0.pop())
+        cells = self.cells
+        # Only bi-value cells can be the pivot or a wing, so index those per line
+        # and pair wings directly instead of scanning every cell for every pivot.
+        bi_by_row = [[] for _ in range(9)]
+        bi_by_col = [[] for _ in range(9)]
+        for n, c in enumerate(cells):
+            if POPCOUNT(c.mask) == 2:
+                bi_by_row[n // 9].append(n)
+                bi_by_col[n % 9].append(n)
+        for n, c in enumerate(cells):
+            if POPCOUNT(c.mask) == 2:
+                c0 = c.mask & -c.mask
+                c1 = c.mask ^ c0
+                col = n % 9
+                for rn in bi_by_row[n // 9]:
+                    if rn == n:
+                        continue
+                    row_wing = cells[rn]
+                    for cn in bi_by_col[col]:
+                        if cn == n:
+                            continue
+                        col_wing = cells[cn]
+                        # The cell opposite the pivot might be a candidate for BLUE.
+                        dc = cells[cn - col + rn % 9]
+                        if (
+                            dc.is_unknown()
+                            and POPCOUNT(row_wing.mask) == 2
+                            and POPCOUNT(col_wing.mask) == 2
+                            and (
+                                (row_wing.mask & c0 and col_wing.mask & c1)
+                                or (row_wing.mask & c1 and col_wing.mask & c0)
+                            )
+                        ):
+                            z0 = row_wing.mask & ~c.mask
+                            z1 = col_wing.mask & ~c.mask
+                            if POPCOUNT(z0) == 1 and z0 == z1:
+                                dc.can_not_be(z0)
 
     def sure_candidate_upgrade_by_row(self):
-        return any(
-            sure_candidate_upgrade_by_cells(
-                self.compartments_by_row[y], self.sure_candidates_by_cross_row[y], Cell.get_sc_by_row
-            )
-            for y in DOWN
-        )
+        compartments = self.compartments_by_row
+        cross = self.sure_candidates_by_cross_row
+        for y in DOWN:
+            if sure_candidate_upgrade_by_cells(compartments[y], cross[y], "sure_candidates_by_row"):
+                return True
+        return False
 
     def sure_candidate_upgrade_by_col(self):
-        return any(
-            sure_candidate_upgrade_by_cells(
-                self.compartments_by_col[x], self.sure_candidates_by_cross_col[x], Cell.get_sc_by_col
-            )
-            for x in ACROSS
-        )
+        compartments = self.compartments_by_col
+        cross = self.sure_candidates_by_cross_col
+        for x in ACROSS:
+            if sure_candidate_upgrade_by_cells(compartments[x], cross[x], "sure_candidates_by_col"):
+                return True
+        return False
 
     def sure_candidate_range_by_row(self):
-        for _, compartment in self._iter_compartments_by_row():
+        for compartment in self.all_compartments_by_row:
             sure_candidate_range_check_by_cells(compartment, Cell.get_sc_by_row)
 
     def sure_candidate_range_by_col(self):
-        for _, compartment in self._iter_compartments_by_col():
+        for compartment in self.all_compartments_by_col:
             sure_candidate_range_check_by_cells(compartment, Cell.get_sc_by_col)
 
+    def _snapshot(self):
+        # The compartment structure never changes, so the whole solver state is the
+        # per-cell masks plus the cross-line sure candidates and known cells.
+        cells = [
+            (c.mask, c.known, c.sure_candidates_by_row, c.sure_candidates_by_col, c.removed) for c in self.cells
+        ]
+        return (
+            cells,
+            dict(self.sure_candidates_by_cross_row),
+            dict(self.sure_candidates_by_cross_col),
+            dict(self._known_cells),
+            self._completeness_val,
+        )
+
+    def _restore(self, snapshot):
+        cells, cross_row, cross_col, known_cells, completeness_val = snapshot
+        for c, (mask, known, sc_row, sc_col, removed) in zip(self.cells, cells):
+            c.mask = mask
+            c.known = known
+            c.sure_candidates_by_row = sc_row
+            c.sure_candidates_by_col = sc_col
+            c.removed = removed
+        self.sure_candidates_by_cross_row = DefaultDict(int, cross_row)
+        self.sure_candidates_by_cross_col = DefaultDict(int, cross_col)
+        self._known_cells = known_cells
+        self._pending_known = {n for n, c in enumerate(self.cells) if c.known and n not in known_cells}
+        self._completeness_val = completeness_val
+        # The restored masks differ from what the rules last saw
+        for lines in self._dirty_by_row.values():
+            lines.update(DOWN)
+        for lines in self._dirty_by_col.values():
+            lines.update(ACROSS)
+
     def chain_contradiction(self):
-        def _solve(b):
-            completeness = b._completeness()
+        def _solve():
+            # Bind the dispatch list and the completeness probe once; this loop
+            # runs for every digit of every guessed cell.
+            steps = Board.steps[:-1]
+            _completeness = self._completeness
+            completeness = _completeness()
             while completeness != 729:
-                for s in Board.steps[:-1]:
-                    hit = s(board)
-                    board._valid()
-                    c = board._completeness()
+                for s in steps:
+                    hit = s(self)
+                    c = _completeness()
                     if hit or completeness != c:
+                        # Only a step that changed the board can have broken it.
+                        self._valid()
                         completeness = c
                         break
                 else:
-                    if board._completeness() == completeness:
-                        board._valid()
+                    if _completeness() == completeness:
                         return False
             else:
-                board._valid()
                 return True
 
         for digits_len in range(2, self.chain_length + 1):
-            for (x, y), cell in self.items():
-                digits = cell.digits
-                if len(digits) == digits_len:
-                    for d in digits:
+            for (x, y), cell in self._white_items:
+                digits = cell.mask
+                if POPCOUNT(digits) == digits_len:
+                    for d in bits(digits):
+                        # Guess the digit on a snapshot rather than a deepcopy.
+                        snapshot = self._snapshot()
                         try:
-                            board = deepcopy(self)
                             # print('Considering', d, 'in', x, y)
-                            board[x, y].value_is(d)
-                            if _solve(b):
+                            cell.value_is(d)
+                            if _solve():
+                                self._restore(snapshot)
                                 cell.value_is(d)
                                 return
-                        except:
-                            # We found a contradiction.
+                            self._restore(snapshot)
+                        except (Board.InvalidSolution, AssertionError):
+                            # We found a contradiction - either _valid noticed the
+                            # dead board or a rule's invariant broke first.
+                            self._restore(snapshot)
                             cell.can_not_be(d)
                             return
 
@@ -1559,23 +1711,27 @@ class Board(dict):
             print(self)
 
         iteration = 0
-        completeness = self._completeness()
+        # Bind the per-step counters and the completeness probe once; the loop
+        # below runs hundreds of times per puzzle.
+        counts, hits, durations = self.counts, self.hits, self.durations
+        _completeness = self._completeness
+        completeness = _completeness()
         while completeness != 729:
-            for s in steps:
+            for n, s in enumerate(steps):
                 start_time = timer()
                 hit = s(self)
                 end_time = timer()
 
-                step_name = s.__name__
-                self.durations[step_name] += end_time - start_time
+                durations[n] += end_time - start_time
 
                 iteration += 1
 
-                c = self._completeness()
+                c = _completeness()
                 if hit or completeness != c:
-                    self.counts[step_name] += c - completeness
-                    self.hits[step_name] += 1
+                    counts[n] += c - completeness
+                    hits[n] += 1
                     if debug:
+                        step_name = s.__name__
                         if step_name in [
                             "remove_used_digits",
                             "sure_candidates_by_row",
@@ -1595,13 +1751,13 @@ class Board(dict):
                     break
                 else:
                     if debug:
-                        _miss(step_name)
+                        _miss(s.__name__)
 
             else:
                 if self._completeness() == completeness:
                     _fail(
                         "{:<12} [{:>4}] [{:>4} of {:2}] [{:3} of 729]".format(
-                            name, iteration, len(self.counts), len(steps), completeness
+                            title, iteration, sum(1 for h in self.hits if h), len(steps), completeness
                         )
                     )
                     self._clear_removed()
@@ -1609,7 +1765,7 @@ class Board(dict):
                     self._valid()
                     return False
         else:
-            _pass("{:<12} [{:>4}] [{:>4} of {:2}]".format(name, iteration, len(self.counts), len(steps)))
+            _pass("{:<12} [{:>4}] [{:>4} of {:2}]".format(title, iteration, sum(1 for h in self.hits if h), len(steps)))
             self._clear_removed()
             if verbose:
                 print(self)
@@ -2118,6 +2274,21 @@ def tests():
     # Black Cell Analysis (found online)
     # test()
 
+    # A board made invalid by a bad hint must escape solve() as a typed
+    # InvalidSolution carrying a cell coordinate the driver's handler can format.
+    board = Board(PUZZLES["easy1"])
+    board["2", "A"].value_is(DIGIT_TO_MASK["9"])
+    try:
+        with redirect_stdout(StringIO()):
+            board.solve("invalid_board")
+    except Board.InvalidSolution as e:
+        with redirect_stdout(StringIO()):
+            _log_exception("invalid_board", e, board)
+        _pass("Test invalid_board")
+    else:
+        _fail("Test invalid_board")
+        exit()
+
 
 ######################################################################################################################
 # Puzzles
@@ -2149,6 +2320,50 @@ def link_to_string(link):
     return "".join(parts)
 
 
+def _log_exception(name, e, b):
+    x, y, digit = e.args
+    _critical('Invalid board for "{}", {}{} {} is {}'.format(name, x, y, "".join(digits_of(b[x, y].mask)), digit))
+    print(b._to_string())
+
+
+def _apply_hints(b, hints):
+    # Apply hints if we have any - useful for testing guesses
+    for hint in hints:
+        cell, value = hint.split("=")
+        if cell[0] not in DOWN or cell[1] not in ACROSS or value not in ALL:
+            _critical("Invalid hint: {}".format(hint))
+        else:
+            _info("Applying hint: {}".format(hint))
+            b[cell[1], cell[0]].value_is(DIGIT_TO_MASK[value])
+
+
+def _solve_one(task):
+    # Worker for --jobs. Captures everything the solver prints so the parent
+    # can replay it in puzzle order, keeping the output identical to a serial
+    # run. Returns None for solved when the board raised and was re-solved in
+    # debug, matching the serial loop which counts neither success nor failure.
+    name, puzzle, chain_length, verbose, debug, sure, hints = task
+    out = StringIO()
+    solved, fatal = None, False
+    with redirect_stdout(out):
+        b = Board(puzzle, chain_length)
+        if hints:
+            _apply_hints(b, hints)
+        try:
+            solved = b.solve(name, verbose=verbose, debug=debug, sure=sure)
+        except Board.InvalidSolution as e:
+            _log_exception(name, e, b)
+            b = Board(puzzle)
+            try:
+                b.solve(name, debug=True)
+            except Board.InvalidSolution as f:
+                _log_exception(name, f, b)
+                fatal = True
+    if solved is None:
+        return name, solved, None, None, None, out.getvalue(), fatal
+    return name, solved, b.counts, b.hits, b.durations, out.getvalue(), fatal
+
+
 PUZZLES = {
     "easy1": "f.3##..##\n41.3#.8.6\n..#..#...\n...b...7#\n#i..6..##\n#....#...\n..8#4.#6.\n..9.a2...\n##56#d2.#",
     "easy2": "##..#c1.#\n.....#..#\n7.##3.e..\n..#5..7..\n.#..#.6i.\n4...65#..\n.2h..##..\nb3.#.....\n#43f#8.#a",
@@ -2240,6 +2455,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "-c", "--chain-length", type=int, default=4, help="maximum length of cell to search for contradictions"
     )
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="solve puzzles with N parallel processes")
     parser.add_argument("--no-tests", dest="tests", action="store_false", help="disable built in technique tests")
     parser.add_argument("--no-counts", dest="counts", action="store_false", help="disable technique counts")
     parser.add_argument("--no-totals", dest="totals", action="store_false", help="disable solver success counts")
@@ -2255,9 +2471,9 @@ if __name__ == "__main__":
                 if line[0] == "#":
                     print(line)
                 else:
-                    parts = line.split(":")
-                    name = parts[0].strip()
-                    puzzle = parts[1].strip()
+                    name, _, puzzle = line.partition(":")
+                    name = name.strip()
+                    puzzle = puzzle.strip()
                     if len(puzzle) > (81 + 81):
                         puzzle = "{}{}".format(puzzle[:81], puzzle[-81:])
                     print("{}:{}".format(name, puzzle))
@@ -2268,102 +2484,108 @@ if __name__ == "__main__":
             for line in f:
                 if line[0] == "#":
                     continue
-                parts = line.split(":")
-                PUZZLES[parts[0]] = link_to_string(parts[1])
+                name, _, link = line.partition(":")
+                PUZZLES[name] = link_to_string(link)
 
     if not args.puzzle:
         puzzles = sorted(PUZZLES.keys())
     else:
-        puzzles = [p for puzzle in args.puzzle for p in PUZZLES.keys() if fnmatch(p, puzzle)]
+        # One compiled alternation beats matching every name against every pattern.
+        matcher = re_compile("|".join(fnmatch_translate(puzzle) for puzzle in args.puzzle))
+        puzzles = [p for p in PUZZLES.keys() if matcher.match(p)]
 
     if args.list:
-        for p in puzzles:
-            if args.verbose:
+        if args.verbose:
+            for p in puzzles:
                 _comment("{}".format(p))
                 print(Board(PUZZLES[p]))
-            else:
-                print(p)
+        elif puzzles:
+            # One write instead of a print per name.
+            print("\n".join(puzzles))
         exit()
 
     if args.tests:
         _comment("Testing techniques")
         tests()
 
-    def _log_exception(name, e, b):
-        _critical('Invalid board for "{0}", {1[0]}{1[1]} {2} is {1[2]}'.format(name, e, "".join(b[e[0], e[1]].digits)))
-        print(b._to_string())
-
-    counts = Counter()
-    hits = Counter()
-    durations = DefaultDict(float)
+    counts = [0] * len(Board.steps)
+    hits = [0] * len(Board.steps)
+    durations = [0.0] * len(Board.steps)
     success, failed = 0, 0
     if puzzles:
         _comment("Puzzle       [Iter] [Techniques] [Digits #  ]")
-        for name in puzzles:
-            b = Board(PUZZLES[name], args.chain_length)
-
-            # Apply hints if we have any - useful for testing guesses
-            if args.hint:
-                for hint in args.hint:
-                    cell, value = hint.split("=")
-                    if cell[0] not in DOWN or cell[1] not in ACROSS or value not in ALL:
-                        _critical("Invalid hint: {}".format(hint))
+        if args.jobs > 1:
+            tasks = [
+                (name, PUZZLES[name], args.chain_length, args.verbose, args.debug, args.sure, args.hint)
+                for name in puzzles
+            ]
+            with Pool(args.jobs) as pool:
+                for name, solved, b_counts, b_hits, b_durations, output, fatal in pool.imap(_solve_one, tasks):
+                    print(output, end="")
+                    if fatal:
+                        exit()
+                    if solved is None:
+                        continue
+                    if solved:
+                        success += 1
                     else:
-                        _info("Applying hint: {}".format(hint))
-                        b[cell[1], cell[0]].value_is(value)
+                        failed += 1
+                    counts[:] = map(add, counts, b_counts)
+                    hits[:] = map(add, hits, b_hits)
+                    durations[:] = map(add, durations, b_durations)
+        else:
+            for name in puzzles:
+                b = Board(PUZZLES[name], args.chain_length)
+                if args.hint:
+                    _apply_hints(b, args.hint)
 
-            try:
-                if b.solve(name, verbose=args.verbose, debug=args.debug, sure=args.sure):
-                    success += 1
-                else:
-                    failed += 1
-                for rule, count in b.counts.items():
-                    counts[rule] += count
-                for rule, hit in b.hits.items():
-                    hits[rule] += hit
-                for rule, duration in b.durations.items():
-                    durations[rule] += duration
-            except Board.InvalidSolution as e:
-                _log_exception(name, e, b)
-                b = Board(PUZZLES[name])
                 try:
-                    b.solve(name, debug=True)
-                except Board.InvalidSolution as f:
-                    _log_exception(name, f, b)
-                    exit()
+                    if b.solve(name, verbose=args.verbose, debug=args.debug, sure=args.sure):
+                        success += 1
+                    else:
+                        failed += 1
+                    counts[:] = map(add, counts, b.counts)
+                    hits[:] = map(add, hits, b.hits)
+                    durations[:] = map(add, durations, b.durations)
+                except Board.InvalidSolution as e:
+                    _log_exception(name, e, b)
+                    b = Board(PUZZLES[name])
+                    try:
+                        b.solve(name, debug=True)
+                    except Board.InvalidSolution as f:
+                        _log_exception(name, f, b)
+                        exit()
 
     if args.counts:
-        counts_total = sum(counts.values())
-        hits_total = sum(hits.values())
-        duration_total = sum(durations.values())
+        counts_total = sum(counts)
+        hits_total = sum(hits)
+        # Nothing merged (every board raised) still reports, as zeroes.
+        duration_total = sum(durations) or 1.0
         rules = [r.__name__ for r in Board.steps]
         _comment("Technique                      [Ord] [Time % Seconds] [Hit %  Hit #] [Digit %  Digit #]")
-        for rule, hit in sorted(hits.items(), reverse=True, key=lambda k_v: k_v[1]):
+        for n in sorted((n for n, hit in enumerate(hits) if hit), reverse=True, key=lambda n: hits[n]):
             _hit(
                 " {:<30} [#{:2}] [{:>5.1%} {:>7.2f}s] [{:>5.1%} {:>6}] [{:>5.1%} {:>10}]".format(
-                    rule,
-                    rules.index(rule),
-                    durations[rule] / duration_total,
-                    durations[rule],
-                    float(hit) / hits_total,
-                    hit,
-                    float(counts[rule]) / counts_total,
-                    counts[rule],
+                    rules[n],
+                    n,
+                    durations[n] / duration_total,
+                    durations[n],
+                    float(hits[n]) / hits_total,
+                    hits[n],
+                    float(counts[n]) / counts_total,
+                    counts[n],
                 )
             )
-        for rule_fn in Board.steps:
-            rule = rule_fn.__name__
-            if rule not in hits:
+        for n, rule in enumerate(rules):
+            if not hits[n]:
                 _miss(
-                    "{:<30} [#{:2}] [{:>5.1%} {:>7.2f}s]".format(
-                        rule, rules.index(rule), durations[rule] / duration_total, durations[rule]
-                    )
+                    "{:<30} [#{:2}] [{:>5.1%} {:>7.2f}s]".format(rule, n, durations[n] / duration_total, durations[n])
                 )
     if args.times:
-        duration_total = sum(durations.values())
+        duration_total = sum(durations) or 1.0
         rule_times = DefaultDict(float)
-        for rule, duration in durations.items():
-            rule = re_sub("(_by_row|_by_col)$", "", rule)
+        for rule_fn, duration in zip(Board.steps, durations):
+            rule = re_sub("(_by_row|_by_col)$", "", rule_fn.__name__)
             rule_times[rule] += duration
         _comment("Rule Times                     [Time % Seconds]")
         for rule, duration in sorted(rule_times.items(), reverse=True, key=lambda k_v: k_v[1]):
@@ -2371,7 +2593,7 @@ if __name__ == "__main__":
                 _hit(" {:<30} [{:>5.1%} {:>7.3f}s]".format(rule, duration / duration_total, duration))
             else:
                 _miss("{:<30} [{:>5.1%} {:>7.3f}s]".format(rule, duration / duration_total, duration))
-        _info("                         Total [ {:12.3f}s]".format(sum(durations.values())))
+        _info("                         Total [ {:12.3f}s]".format(sum(durations)))
     if args.totals:
         _comment("Total # Puzzles")
         _pass("{} boards".format(success))